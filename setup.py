@@ -15,7 +15,7 @@ setup(
     packages = find_packages(),
     scripts = [],
 
-    install_requires = ['arrow', 'requests'],
+    install_requires = ['arrow', 'requests', 'orjson'],
 
     package_data = {
         '': [ '*.md' ],
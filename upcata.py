@@ -24,20 +24,47 @@ __date__ = 'Sep 17 2019'
 import os
 import sys
 import re
+import json
+import time
+import errno
 import shutil
 import logging
+import threading
+import subprocess
 import tarfile
 import warnings
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import arrow
 from arrow.factory import ArrowParseWarning
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 
 logger = logging.getLogger('upcata')
 CURRENT_LINK = './current'
 USERDATA_DIR = './userdata'
+USERDATA_SUBDIRS = ('save', 'config', 'sound')
+TAR_BUFSIZE = 1048576
+DOWNLOAD_PARTS = 4
+_NL_TABLE = str.maketrans({'\n': '\n\t'})
+_VERSION_RE = re.compile(r'^cataclysmdda-(?P<version>[0-9A-Z\.]+)-b?(?P<build>[0-9]+)$', re.I)
+CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'upcata', 'github.json')
+CACHE_TTL = 300
+CACHE_MAXAGE = 86400
+
+# shared HTTP session, so connections are reused between requests
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                                       max_retries=Retry(total=3, backoff_factor=0.3)))
+_session.headers['User-Agent'] = 'upcata/' + __version__
 
 
 # disable ArrowParseWarning for 0.14.3+
@@ -64,12 +91,102 @@ def setup_logging(clevel=logging.INFO, flevel=logging.DEBUG, logfile=None):
         except Exception as e:
             logger.warning("Failed to open logfile %s: %s", logfile, str(e))
 
+class _ProgressReader(object):
+    """
+    File-like wrapper around @fileobj that prints a progress dot
+    for every @step bytes read, flushing stdout at most once
+    every @interval seconds
+    """
+    def __init__(self, fileobj, step=1048576, interval=0.25):
+        self.fileobj = fileobj
+        self.step = step
+        self.interval = interval
+        self.count = 0
+        self.last_flush = time.monotonic()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        last = self.count // self.step
+        self.count += len(data)
+        if self.count // self.step > last:
+            sys.stdout.write('.')
+            now = time.monotonic()
+            if now - self.last_flush >= self.interval:
+                sys.stdout.flush()
+                self.last_flush = now
+        return data
+
+def _load_cache(cpath=CACHE_FILE):
+    """
+    Load cached GitHub API responses from @cpath
+    """
+    try:
+        with open(cpath, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    # ignore anything that isn't a valid cache entry
+    if not isinstance(cache, dict):
+        return {}
+    return {k: v for k, v in cache.items()
+            if isinstance(v, dict) and isinstance(v.get('ts'), (int, float))
+            and isinstance(v.get('body'), str) and isinstance(v.get('etag'), (str, type(None)))}
+
+def _save_cache(cache, cpath=CACHE_FILE):
+    """
+    Write GitHub API response @cache to @cpath, dropping stale entries
+    """
+    now = time.time()
+    cache = {k: v for k, v in cache.items() if now - v['ts'] < CACHE_MAXAGE}
+
+    try:
+        os.makedirs(os.path.dirname(cpath), exist_ok=True)
+        with open(cpath + '.tmp', 'w') as f:
+            json.dump(cache, f)
+        os.replace(cpath + '.tmp', cpath)
+    except OSError as e:
+        logger.debug("Failed to write cache file %s: %s", cpath, str(e))
+
+def _github_get(url):
+    """
+    Fetch JSON from GitHub API @url. Responses are cached on disk
+    for CACHE_TTL seconds, then revalidated with their ETag
+    """
+    cache = _load_cache()
+    entry = cache.get(url)
+    now = time.time()
+
+    if entry and now - entry['ts'] < CACHE_TTL:
+        try:
+            rjson = _json_loads(entry['body'])
+            logger.debug("Using cached response for <%s>", url)
+            return rjson
+        except ValueError:
+            del cache[url]
+            entry = None
+
+    headers = {'Accept': 'application/vnd.github+json'}
+    if entry and entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+
+    r = _session.get(url, headers=headers)
+    if r.status_code == 304 and entry:
+        logger.debug("Cached response for <%s> not modified", url)
+        entry['ts'] = now
+    elif r.ok:
+        entry = cache[url] = {'etag': r.headers.get('ETag'), 'ts': now, 'body': r.text}
+    else:
+        return _json_loads(r.content)
+
+    _save_cache(cache)
+    return _json_loads(entry['body'])
+
 def get_changes(old, new, prefix='cdda-jenkins-b'):
     """
     Get changes between @old and @new commits/branches
     """
-    r = requests.get('https://api.github.com/repos/CleverRaven/Cataclysm-DDA/compare/{}{}...{}{}'.format(prefix, old, prefix, new))
-    rjson = r.json()
+    rjson = _github_get('https://api.github.com/repos/CleverRaven/Cataclysm-DDA/compare/{}{}...{}{}'.format(prefix, old, prefix, new))
 
     try:
         commits = rjson['commits']
@@ -77,10 +194,12 @@ def get_changes(old, new, prefix='cdda-jenkins-b'):
         logger.error("Failed to fetch changes: %s", rjson.get('message'))
         return []
 
-    chglog = [ "{ts} [{commit[author][name]}] {msg}".format(
-                msg=x['commit']['message'].replace('\n\n', '\n').replace('\n', '\n\t').strip(),
-                ts=arrow.get(x['commit']['author']['date']).format("MMM DD YYYY"),
-                **x) for x in sorted(commits, key=lambda x: x['commit']['author']['date'], reverse=True) ]
+    chglog = []
+    for tcommit in sorted((x['commit'] for x in commits), key=lambda x: x['author']['date'], reverse=True):
+        tauthor = tcommit['author']
+        ts = arrow.get(tauthor['date']).format("MMM DD YYYY")
+        msg = tcommit['message'].replace('\n\n', '\n').translate(_NL_TABLE).strip()
+        chglog.append(f"{ts} [{tauthor['name']}] {msg}")
 
     return chglog
 
@@ -88,12 +207,13 @@ def get_latest_release(platform, prefix='cdda-jenkins-b'):
     """
     Get latest Cata release for @platform
     """
-    r = requests.get('https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases')
-    releases = r.json()
+    releases = _github_get('https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases')
 
+    plat_lower = platform.lower()
     tlatest = None
     for trel in releases:
-        if len([ x for x in trel['assets'] if x['label'].lower() == platform.lower() ]):
+        tasset = next((x for x in trel['assets'] if (x.get('label') or '').lower() == plat_lower), None)
+        if tasset is not None:
             tlatest = trel
             break
 
@@ -102,7 +222,7 @@ def get_latest_release(platform, prefix='cdda-jenkins-b'):
         return None
 
     tlatest['build'] = tlatest['tag_name'].replace(prefix, '')
-    tlatest['tasset'] = [ x for x in tlatest['assets'] if x['label'].lower() == platform.lower() ][0]
+    tlatest['tasset'] = tasset
     return tlatest
 
 def get_current_release(cpath=CURRENT_LINK):
@@ -116,56 +236,194 @@ def get_current_release(cpath=CURRENT_LINK):
         return None
 
     try:
-        res = re.match(r'^cataclysmdda-(?P<version>[0-9A-Z\.]+)-b?(?P<build>[0-9]+)$', tlink, re.I).groupdict()
+        res = _VERSION_RE.match(tlink).groupdict()
     except Exception:
         logger.warning("Unable to parse release/version info from symlink '%s'", cpath)
         return None
 
-    resdate = arrow.get(os.stat('./current').st_mtime).format("MMM DD, YYYY HH:MM")
+    resdate = arrow.get(os.stat('./current').st_mtime).format("MMM DD, YYYY HH:mm")
     logger.info("Local build: %s (updated %s)", res['build'], resdate)
 
     return res['build']
 
-def download_release(url, filename, save_prefix='./'):
+def _download_range(url, fd, start, end):
+    """
+    Fetch bytes @start through @end of @url and write them
+    to file descriptor @fd at the same offset
+    """
+    with _session.get(url, headers={'Range': 'bytes=%d-%d' % (start, end)}, stream=True) as r:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise IOError("Server ignored range request (HTTP %d)" % (r.status_code))
+
+        reader = _ProgressReader(r.raw)
+        offset = start
+        while True:
+            data = reader.read(1048576)
+            if not data:
+                break
+            os.pwrite(fd, data, offset)
+            offset += len(data)
+
+    if offset != end + 1:
+        raise IOError("Incomplete download of range %d-%d" % (start, end))
+
+def download_release(url, filename, save_prefix='./', parts=DOWNLOAD_PARTS):
     """
     Download release from @url and save to @save_prefix
+
+    If the server accepts range requests, the file is split into
+    @parts ranges which are fetched in parallel
     """
     lpath = os.path.realpath(os.path.join(save_prefix, filename))
 
     logger.info("Fetching update: %s --> %s", url, lpath)
     sys.stdout.write("*** Downloading...")
 
-    with open(lpath, 'wb') as f:
-        with requests.get(url, allow_redirects=True, stream=True) as r:
-            try:
-                r.raise_for_status()
-            except Exception as e:
-                sys.stdout.write("\n")
-                logger.error("Error while fetching update from <%s>: %s", url, str(e))
-                return None
+    # Check for range support; on any failure, fall back to a single stream
+    size = 0
+    try:
+        rhead = _session.head(url, allow_redirects=True)
+        rhead.raise_for_status()
+        if rhead.headers.get('Accept-Ranges') == 'bytes':
+            size = int(rhead.headers.get('Content-Length') or 0)
+    except Exception as e:
+        logger.debug("HEAD request for <%s> failed, not splitting download: %s", url, str(e))
+
+    try:
+        with open(lpath, 'wb') as f:
+            if parts > 1 and size:
+                logger.debug("Fetching %d bytes in %d parts from <%s>", size, parts, rhead.url)
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except (AttributeError, OSError):
+                    f.truncate(size)
+
+                psize = -(-size // parts)
+                with ThreadPoolExecutor(max_workers=parts) as executor:
+                    tparts = [executor.submit(_download_range, rhead.url, f.fileno(), start, min(start + psize, size) - 1)
+                              for start in range(0, size, psize)]
+                    for tfut in tparts:
+                        tfut.result()
+            else:
+                with _session.get(url, allow_redirects=True, stream=True) as r:
+                    r.raise_for_status()
+                    r.raw.decode_content = True
+                    shutil.copyfileobj(_ProgressReader(r.raw), f, 1048576)
+
+    except Exception as e:
+        sys.stdout.write("\n")
+        logger.error("Error while fetching update from <%s>: %s", url, str(e))
+        return None
 
-            itx = 0
-            for tchunk in r.iter_content(chunk_size=32768):
-                if tchunk:
-                    f.write(tchunk)
-                    if not itx % 32:
-                        sys.stdout.write('.')
-                        sys.stdout.flush()
     sys.stdout.write("\n")
     logger.info("Download complete")
     return lpath
 
+def _write_member(dest, data, mode):
+    """
+    Write extracted tar member @data to @dest
+    """
+    with open(dest, 'wb') as f:
+        f.write(data)
+    if mode is not None:
+        os.chmod(dest, mode & 0o777)
+
+def _filter_member(m, ppath):
+    """
+    Check that tar member @m, and the target of any link, stays inside
+    @ppath. Returns the (possibly sanitized) member, raises otherwise
+    """
+    if hasattr(tarfile, 'data_filter'):
+        return tarfile.data_filter(m, ppath)
+
+    def _inside(path):
+        return os.path.commonpath([ppath, os.path.realpath(path)]) == ppath
+
+    if os.path.isabs(m.name) or not _inside(os.path.join(ppath, m.name)):
+        raise tarfile.ExtractError("Refusing to extract unsafe path '%s'" % (m.name))
+
+    if m.issym() or m.islnk():
+        # symlinks are relative to their directory, hardlinks to the archive root
+        lbase = os.path.join(ppath, os.path.dirname(m.name)) if m.issym() else ppath
+        if os.path.isabs(m.linkname) or not _inside(os.path.join(lbase, m.linkname)):
+            raise tarfile.ExtractError("Refusing to extract '%s' linking outside of destination ('%s')" % (m.name, m.linkname))
+
+    return m
+
+def _extract_members(f, ppath, workers=8):
+    """
+    Extract all members of tarfile @f to @ppath
+
+    Members are read from the archive serially, while regular file
+    writes are handed off to a pool of @workers threads. Ownership,
+    modification times and directory modes are not restored.
+    """
+    slots = threading.BoundedSemaphore(workers * 4)
+    pending = []
+    seen_dirs = set()
+
+    def _makedirs(path):
+        # only hit the filesystem once per directory
+        if path not in seen_dirs:
+            os.makedirs(path, exist_ok=True)
+            seen_dirs.add(path)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for m in f:
+            m = _filter_member(m, ppath)
+            dest = os.path.join(ppath, m.name)
+
+            if m.isdir():
+                _makedirs(dest)
+            elif m.isfile():
+                _makedirs(os.path.dirname(dest))
+                data = f.extractfile(m).read()
+                slots.acquire()
+                tfut = executor.submit(_write_member, dest, data, m.mode)
+                tfut.add_done_callback(lambda _: slots.release())
+                pending.append(tfut)
+            elif m.issym():
+                _makedirs(os.path.dirname(dest))
+                os.symlink(m.linkname, dest)
+            else:
+                # hardlinks and special files; finish pending writes
+                # first, since a hardlink target may still be in flight
+                for tfut in pending:
+                    tfut.result()
+                if hasattr(tarfile, 'data_filter'):
+                    f.extract(m, path=ppath, set_attrs=False, filter='data')
+                else:
+                    f.extract(m, path=ppath, set_attrs=False)
+
+        for tfut in pending:
+            tfut.result()
+
+def _tar_topdir(tarball):
+    """
+    Get top-level directory name of @tarball from its first member
+    """
+    with tarfile.open(tarball, 'r|*') as f:
+        return next(iter(f)).name.split('/')[0]
+
 def extract_tarball(tarball, prefix='./'):
     """
     Extract tarball to @prefix
+
+    Uses tar + pigz (parallel gzip) when both are available,
+    otherwise falls back to the tarfile module
     """
     ppath = os.path.realpath(prefix)
     logger.info("Extracting archive to prefix [%s] ...", ppath)
 
+    pigz = shutil.which('pigz')
+    tar = shutil.which('tar')
+    created = None
+
     try:
-        with tarfile.open(tarball, 'r') as f:
+        if pigz and tar:
             # Get top-level directory name
-            topdir = f.getmembers()[0].name.split('/')[0]
+            topdir = _tar_topdir(tarball)
             rtopdir = os.path.realpath(os.path.join(ppath, topdir))
 
             # Ensure topdir does not already exist
@@ -174,15 +432,122 @@ def extract_tarball(tarball, prefix='./'):
                 return None
 
             # Extract all the things
-            f.extractall(path=ppath)
+            created = rtopdir
+            logger.debug("Extracting with %s (%s)", tar, pigz)
+            subprocess.run([tar, '--use-compress-program=' + pigz, '-xf', tarball, '-C', ppath], check=True)
+        else:
+            with tarfile.open(tarball, 'r|*', bufsize=TAR_BUFSIZE) as f:
+                # Get top-level directory name
+                topdir = f.next().name.split('/')[0]
+                rtopdir = os.path.realpath(os.path.join(ppath, topdir))
+
+                # Ensure topdir does not already exist
+                if os.path.exists(rtopdir):
+                    logger.error("Path [%s] already exists! Move or delete directory first.", rtopdir)
+                    return None
+
+                # Extract all the things
+                created = rtopdir
+                _extract_members(f, ppath)
 
     except Exception as e:
         logger.error("Failed to extract archive: %s", str(e))
+        # Remove partially extracted directory, so the next run can retry
+        if created:
+            shutil.rmtree(created, ignore_errors=True)
         return None
 
     logger.info("Extracted archive successfully")
     return topdir
 
+def download_and_extract(url, prefix='./'):
+    """
+    Download release tarball from @url and extract it to @prefix
+    as it streams in, without saving the tarball to disk
+    """
+    ppath = os.path.realpath(prefix)
+
+    logger.info("Fetching update: %s --> [%s]", url, ppath)
+    sys.stdout.write("*** Downloading...")
+    created = None
+
+    try:
+        with _session.get(url, allow_redirects=True, stream=True) as r:
+            r.raise_for_status()
+            r.raw.decode_content = False
+
+            with tarfile.open(fileobj=_ProgressReader(r.raw), mode='r|gz', bufsize=TAR_BUFSIZE) as f:
+                # Get top-level directory name
+                topdir = f.next().name.split('/')[0]
+                rtopdir = os.path.realpath(os.path.join(ppath, topdir))
+
+                # Ensure topdir does not already exist
+                if os.path.exists(rtopdir):
+                    sys.stdout.write("\n")
+                    logger.error("Path [%s] already exists! Move or delete directory first.", rtopdir)
+                    return None
+
+                # Extract all the things
+                created = rtopdir
+                _extract_members(f, ppath)
+
+    except Exception as e:
+        sys.stdout.write("\n")
+        logger.error("Error while fetching update from <%s>: %s", url, str(e))
+        # Remove partially extracted directory, so the next run can retry
+        if created:
+            shutil.rmtree(created, ignore_errors=True)
+        return None
+
+    sys.stdout.write("\n")
+    logger.info("Downloaded and extracted archive successfully")
+    return topdir
+
+def _fast_copy(src, dst, *, follow_symlinks=True):
+    """
+    Copy file @src to @dst using os.copy_file_range() where available,
+    so the kernel (or filesystem, via CoW reflinks) does the copying.
+    Falls back to shutil.copyfile() when unsupported
+    """
+    if not follow_symlinks and os.path.islink(src):
+        return shutil.copy2(src, dst, follow_symlinks=False)
+
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+            shutil.copyfile(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+    shutil.copystat(src, dst)
+    return dst
+
+def _walk_copy(src, dst):
+    """
+    Recursively copy directory @src to @dst, preserving symlinks
+
+    Entry types come from os.scandir(), which avoids the extra
+    per-entry lstat() done by shutil.copytree()
+    """
+    os.makedirs(dst)
+    with os.scandir(src) as it:
+        for entry in it:
+            tdst = os.path.join(dst, entry.name)
+            if entry.is_symlink():
+                os.symlink(os.readlink(entry.path), tdst)
+            elif entry.is_dir(follow_symlinks=False):
+                _walk_copy(entry.path, tdst)
+            else:
+                _fast_copy(entry.path, tdst)
+
+    shutil.copystat(src, dst)
+    return dst
+
 def backup_data():
     """
     Backup userdata (saves, config, etc.)
@@ -191,8 +556,22 @@ def backup_data():
     savedir = os.path.realpath("save-" + arrow.get().format('YYYYMMDD-HHMMSS'))
 
     logger.info("Backing up user save and config data to [%s] ..." % (savedir))
+
+    # Let GNU cp clone file extents where the filesystem supports
+    # reflinks (btrfs, xfs); it does a regular copy otherwise. If savedir
+    # already exists, leave it alone and let the fallback report the error
+    cp = shutil.which('cp')
+    if sys.platform.startswith('linux') and cp and not os.path.lexists(savedir):
+        try:
+            subprocess.run([cp, '--reflink=auto', '-a', '-T', srcdir, savedir], check=True)
+            logger.info("Backup complete")
+            return savedir
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.debug("cp failed, falling back to internal copy: %s", str(e))
+            shutil.rmtree(savedir, ignore_errors=True)
+
     try:
-        shutil.copytree(srcdir, savedir, symlinks=True)
+        _walk_copy(srcdir, savedir)
     except Exception as e:
         logger.error("Failed to copy save data: %s", str(e))
         return None
@@ -200,13 +579,26 @@ def backup_data():
     logger.info("Backup complete")
     return savedir
 
+def show_changes(build, chglog):
+    """
+    Print changelog @chglog since local @build
+    """
+    print("Changes since your local build (#%s):\n" % (build))
+    for tline in chglog:
+        print("  %s" % (tline))
+    print("****************************")
+
 def parse_cli():
     """parse CLI options with argparse"""
     aparser = ArgumentParser(description="Cataclysm DDA updater")
-    aparser.set_defaults(release=None, update=False, logfile=None, loglevel=logging.INFO)
+    aparser.set_defaults(release=None, update=False, keep_tarball=False, no_changes=False, logfile=None, loglevel=logging.INFO)
 
     aparser.add_argument("release", action="store", nargs="?", metavar="RELEASE", help="Release number")
     aparser.add_argument("--update", "-u", action="store_true", help="Update to latest (or specified) release")
+    aparser.add_argument("--keep-tarball", "-k", action="store_true",
+                         help="Save release tarball to disk before extracting, instead of extracting while downloading")
+    aparser.add_argument("--no-changes", "-n", action="store_true",
+                         help="Don't fetch or show changes since the local build")
     aparser.add_argument("--debug", "-d", action="store_const", dest="loglevel", const=logging.DEBUG, help="Show debug messages")
     aparser.add_argument("--logfile", "-l", action="store", metavar="LOGPATH",
                          help="Path to output logfile [default: %(default)s]")
@@ -230,35 +622,58 @@ def _main():
         logger.info("Up-to-date on build %s", rlatest['build'])
         return
 
+    # Fetch changes in the background, so that in update mode
+    # the request overlaps with the release download
+    if rlocal and not args.no_changes:
+        executor = ThreadPoolExecutor(max_workers=1)
+        fchanges = executor.submit(get_changes, rlocal, rlatest['build'])
+        executor.shutdown(wait=False)
+    else:
+        fchanges = None
+
     # Show build info
     print("*** New build available! ***")
-    print("Build %s (%s)" % (rlatest['build'], arrow.get(rlatest['published_at']).format("MMM DD, YYYY HH:MM (Z)")))
+    print("Build %s (%s)" % (rlatest['build'], arrow.get(rlatest['published_at']).format("MMM DD, YYYY HH:mm (Z)")))
     print("%s %s" % (rlatest['name'], '[EXPERIMENTAL]' if rlatest.get('prerelease') else '[STABLE]'))
     print("Commit: %s @ %s" % (rlatest['target_commitish'], rlatest['tag_name']))
     print("****************************")
 
     # Show changes
-    if rlocal:
-        print("Changes since your local build (#%s):\n" % (rlocal))
-        for tline in get_changes(rlocal, rlatest['build']):
-            print("  %s" % (tline))
-        print("****************************")
+    if fchanges and not args.update:
+        show_changes(rlocal, fchanges.result())
 
     # Update mode
     if args.update:
         logger.info("Updating to latest release.")
 
-        # Fetch latest release tarball
-        tball = download_release(rlatest['tasset']['browser_download_url'], rlatest['tasset']['name'])
-        if not tball:
-            logger.critical("Download failed. Aborting.")
-            sys.exit(2)
-
-        # Extract tarball
-        tdir = extract_tarball(tball)
-        if not tdir:
-            logger.critical("Extraction failed. Aborting.")
-            sys.exit(2)
+        if args.keep_tarball:
+            # Fetch latest release tarball
+            tball = download_release(rlatest['tasset']['browser_download_url'], rlatest['tasset']['name'])
+            if not tball:
+                logger.critical("Download failed. Aborting.")
+                sys.exit(2)
+
+            # Extract tarball
+            tdir = extract_tarball(tball)
+            if not tdir:
+                logger.critical("Extraction failed. Aborting.")
+                sys.exit(2)
+        else:
+            # Fetch and extract latest release tarball in a single pass
+            tdir = download_and_extract(rlatest['tasset']['browser_download_url'])
+            if not tdir:
+                logger.critical("Download failed. Aborting.")
+                sys.exit(2)
+
+        # Show changes, now that the download has finished; the
+        # changelog is optional, so a failure here must not abort the update
+        if fchanges:
+            try:
+                chglog = fchanges.result()
+            except Exception as e:
+                logger.warning("Failed to fetch changes: %s", str(e))
+            else:
+                show_changes(rlocal, chglog)
 
         # Add version/build suffix to directory
         newpath = tdir + '-' + rlatest['build']
@@ -276,25 +691,21 @@ def _main():
             logger.warning("Failed to remove symlink: %s", linkpath)
         os.symlink(newpath, linkpath)
 
-        # Ensure userdata directory exists
-        ud_save = os.path.realpath(os.path.join(USERDATA_DIR, 'save'))
-        ud_config = os.path.realpath(os.path.join(USERDATA_DIR, 'config'))
-        ud_sound = os.path.realpath(os.path.join(USERDATA_DIR, 'sound'))
-        if not (os.path.exists(ud_save) and \
-                os.path.exists(ud_config) and \
-                os.path.exists(ud_sound)):
-            logger.info("Creating missing userdata directories")
+        # Ensure userdata directories exist
+        udpaths = [os.path.join(USERDATA_DIR, x) for x in USERDATA_SUBDIRS]
+        for tpath in udpaths:
             try:
-                os.makedirs(os.path.join(USERDATA_DIR, 'save'))
-                os.makedirs(os.path.join(USERDATA_DIR, 'config'))
-                os.makedirs(os.path.join(USERDATA_DIR, 'sound'))
+                os.makedirs(tpath)
+                logger.info("Created missing userdata directory [%s]", tpath)
+            except FileExistsError:
+                pass
             except Exception as e:
-                logger.error("Failed to create missing userdata directories: %s", str(e))
+                logger.error("Failed to create missing userdata directory [%s]: %s", tpath, str(e))
 
         # Create data symlinks in new directory
-        os.symlink(os.path.realpath(os.path.join(USERDATA_DIR, 'save')), os.path.join(newpath, 'save'))
-        os.symlink(os.path.realpath(os.path.join(USERDATA_DIR, 'config')), os.path.join(newpath, 'config'))
-        os.symlink(os.path.realpath(os.path.join(USERDATA_DIR, 'sound')), os.path.join(newpath, 'sound'))
+        udroot = os.path.realpath(USERDATA_DIR)
+        for tsub in USERDATA_SUBDIRS:
+            os.symlink(os.path.join(udroot, tsub), os.path.join(newpath, tsub))
 
         # Backup data
         savedir = backup_data()